@@ -55,6 +55,8 @@ def split_paragraphs(df):
 
 
 class ExactDeDuplicationStep(PipelineStep):
+    cross_row = True
+
     def __init__(self, name, validator):
         super().__init__(name, validator)
     
@@ -94,6 +96,8 @@ class ExactDeDuplicationStep(PipelineStep):
         return deduped_df
 
 class FuzzyDeduplicationStep(PipelineStep):
+    cross_row = True
+
     def __init__(self, name, validator):
         super().__init__(name, validator)
     
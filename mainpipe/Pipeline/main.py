@@ -17,10 +17,20 @@ from initial_cleaning import QualityFilteringSTep
 import numpy as np
 import os
 from tokenise import TokenizationStep
+from profiler import recommend_chunk_size, recommend_workers
+from writers import make_writer
 
 CHUNK_SIZE = 300000
+MAX_ROWS = 1000000 # for testing purposes
 INPUT_FILE = "../../data/raw/mainpipe_data_v1.jsonl"
 OUTPUT_FILE = "../../data/cleaned/cleaned_csv_test.JSONL"
+DRY_RUN = False # set True to project the cost of a full run from a sample instead of running it
+DRY_RUN_SAMPLE_SIZE = 10000
+MEMORY_BUDGET_BYTES = 16 * 1024**3
+MAX_WORKERS = 8
+OUTPUT_FORMAT = "jsonl" # "jsonl", "parquet" or "arrow"
+OUTPUT_COMPRESSION = None # jsonl: None or "gzip", parquet: e.g. "zstd"/"snappy", arrow: "zstd"/"lz4"
+MAX_SHARD_BYTES = 1024**3
 
 def main():
     # Pipeline cleaning steps
@@ -51,14 +61,41 @@ def main():
     
 
     pipeline = Pipeline(steps, tokeniserStep)
+
+    # run the pipeline on a sample and project full run cost per step
+    if DRY_RUN:
+        dry_run_report = pipeline.dry_run(INPUT_FILE, sample_size=DRY_RUN_SAMPLE_SIZE, chunk_size=CHUNK_SIZE,
+                                          max_rows=MAX_ROWS)
+        print(dry_run_report[['step_name', 'projected_rows_out', 'block_local', 'projected_runtime_sec',
+                              'runtime_share']])
+        print("block_local rows out are upper bounds, duplicates across a full chunk are not seen in the sample")
+        print(f"Projected total runtime (sec): {dry_run_report['projected_runtime_sec'].sum():.0f} "
+              f"({dry_run_report['projected_runtime_sec_low'].sum():.0f} - "
+              f"{dry_run_report['projected_runtime_sec_high'].sum():.0f})")
+        print(f"Recommended chunk size: {recommend_chunk_size(dry_run_report, CHUNK_SIZE, MEMORY_BUDGET_BYTES)}")
+        print(f"Recommended workers: {recommend_workers(dry_run_report, MEMORY_BUDGET_BYTES, MAX_WORKERS)}")
+
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        report_dir = "../../reports"
+        os.makedirs(report_dir, exist_ok=True)
+        dry_run_report.to_csv(os.path.join(report_dir, f"dry_run_report_{timestamp}.csv"), index=False)
+        return
+
     # ammended for batch loading
     batch = []
     first_chunk = True
 
+    # token arrays are appended per chunk, start fresh so token row i matches doc_id i
+    token_file = OUTPUT_FILE.replace(".JSONL", "_tokens.npy")
+    if os.path.exists(token_file):
+        os.remove(token_file)
+
     # run pipeline implemented with batching
-    MAX_ROWS = 1000000 # for testing purposes
     row_count = 0
-    with open(INPUT_FILE, "r", encoding="utf-8") as f:
+    # the writer closes its shard (and writes any footer) even if a chunk fails
+    with open(INPUT_FILE, "r", encoding="utf-8") as f, \
+            make_writer(OUTPUT_FORMAT, OUTPUT_FILE, max_shard_bytes=MAX_SHARD_BYTES,
+                        compression=OUTPUT_COMPRESSION) as writer:
         for line in f:
             if row_count >= MAX_ROWS:
                 break  # stop after 5000 rows
@@ -72,13 +109,10 @@ def main():
                 df = pd.DataFrame(batch)
                 df_clean, df_tokenised = pipeline.run(df)
 
-                # save cleaned text data to jsonl
-                with open(OUTPUT_FILE, "a", encoding="utf-8") as out_file:
-                    for record in df_clean.to_dict(orient="records"):
-                        out_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                # save cleaned text data to output shards
+                writer.write(df_clean)
 
                 # save tokenised df to numpy
-                token_file = OUTPUT_FILE.replace(".JSONL", "_tokens.npy")
                 token_arrays = np.array(df_tokenised["token_ids"].tolist(), dtype=object)
 
                 if not os.path.exists(token_file):
@@ -96,12 +130,9 @@ def main():
             df_clean, df_tokenised = pipeline.run(df)
 
             # Save cleaned text
-            with open(OUTPUT_FILE, "a", encoding="utf-8") as out_file:
-                for record in df_clean.to_dict(orient="records"):
-                    out_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            writer.write(df_clean)
 
             # Save tokenized arrays
-            token_file = OUTPUT_FILE.replace(".JSONL", "_tokens.npy")
             token_arrays = np.array(df_tokenised["token_ids"].tolist(), dtype=object)
 
             if not os.path.exists(token_file):
@@ -111,7 +142,7 @@ def main():
                 combined = np.concatenate((existing, token_arrays), axis=0)
                 np.save(token_file, combined)
 
-    print(f"All batches processed {OUTPUT_FILE}")
+    print(f"All batches processed {writer.shard_paths}")
     for step in pipeline.steps:
         metrics = {
             'step_name': step.name,
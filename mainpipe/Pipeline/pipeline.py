@@ -1,8 +1,12 @@
 import pandas as pd
 import time
 import os
+from profiler import profile_pipeline
 
 class PipelineStep:
+    # True for steps whose result depends on other rows in the chunk (e.g. deduplication)
+    cross_row = False
+
     def __init__(self, name:str, validator):
         self.removed_rows = pd.DataFrame()
         self.name = name
@@ -50,4 +54,15 @@ class Pipeline:
             tokeniser_df = step.run_with_timer(df)
             print(f"Tokeniser run")
 
-        return df, tokeniser_df
\ No newline at end of file
+        return df, tokeniser_df
+
+    def dry_run(self, input_file, sample_size=10000, n_blocks=10, chunk_size=300000, max_rows=None,
+                trace_memory=True, seed=None):
+        """
+        Run all steps (including the tokeniser) on a uniform sample of input_file and return a
+        DataFrame projecting the runtime, rows, output size and chunk memory of each step for the full input
+        """
+        print(f"Dry run: sampling {sample_size} rows from {input_file}")
+        return profile_pipeline(self.steps + list(self.tokeniser_step), input_file, sample_size=sample_size,
+                                n_blocks=n_blocks, chunk_size=chunk_size, max_rows=max_rows,
+                                trace_memory=trace_memory, seed=seed)
\ No newline at end of file
@@ -0,0 +1,235 @@
+import pandas as pd
+import numpy as np
+import json
+import random
+import time
+import tracemalloc
+from statistics import NormalDist
+
+def iter_line_offsets(path):
+    """
+    Yield the byte offset of the start of every non-empty line in a JSONL file
+    """
+    with open(path, "rb") as f:
+        offset = f.tell()
+        line = f.readline()
+        while line:
+            if line.strip():
+                yield offset
+            offset = f.tell()
+            line = f.readline()
+
+def reservoir_sample(items, k, seed=None):
+    """
+    Uniform sample of k items from an iterable of unknown length (Algorithm R).
+    Returns the sample and the total number of items seen
+    """
+    rng = random.Random(seed)
+    reservoir = []
+    n = 0
+    for item in items:
+        if n < k:
+            reservoir.append(item)
+        else:
+            j = rng.randint(0, n)
+            if j < k:
+                reservoir[j] = item
+        n += 1
+    return reservoir, n
+
+def read_records_at_offsets(path, offsets):
+    """
+    Seek to each byte offset and decode the JSON record on that line.
+    Returns the records and the number of lines that failed to decode
+    """
+    records = []
+    failed = 0
+    with open(path, "rb") as f:
+        for offset in sorted(offsets):
+            f.seek(offset)
+            try:
+                records.append(json.loads(f.readline().decode("utf-8")))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                failed += 1
+    return records, failed
+
+def jsonl_size_bytes(df):
+    """
+    Size in bytes of df when written out as JSONL
+    """
+    if len(df) == 0:
+        return 0
+    return len(df.to_json(orient="records", lines=True, force_ascii=False, double_precision=15).encode("utf-8"))
+
+def confidence_interval(values, confidence=0.95):
+    """
+    Mean and normal approximation confidence interval of a list of per block measurements
+    """
+    values = np.asarray(values, dtype=float)
+    mean = float(values.mean())
+    if len(values) < 2:
+        return mean, mean, mean
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    half_width = z * float(values.std(ddof=1)) / np.sqrt(len(values))
+    return mean, mean - half_width, mean + half_width
+
+def run_steps_on_block(steps, records, trace_memory=False):
+    """
+    Build a DataFrame from a block of sampled records and run each step on it, recording rows in/out,
+    runtime, output size and (optionally) peak traced memory. Nothing is validated or written to reports.
+
+    When tracing, the records are re-decoded and the DataFrame is built after tracing starts, so each
+    step's peak includes the resident chunk (records list and DataFrame) as well as the step's own
+    allocations. tracemalloc only sees python allocations, native memory such as the Rust tokenizer
+    or Arrow backed string columns is not counted
+    """
+    if trace_memory:
+        tracemalloc.start()
+        # fresh copies so the block's strings are allocated while tracing, like main.py's batch
+        records = [json.loads(json.dumps(record)) for record in records]
+    df = pd.DataFrame(records)
+
+    measurements = []
+    for step in steps:
+        rows_in = len(df)
+        if trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        df = step.run(df)
+        runtime = time.perf_counter() - start
+        peak = None
+        if trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+        measurements.append({
+            'step_name': step.name,
+            'rows_in': rows_in,
+            'rows_out': len(df),
+            'runtime_sec': runtime,
+            'peak_memory_bytes': peak,
+            'output_bytes': jsonl_size_bytes(df),
+        })
+
+    if trace_memory:
+        tracemalloc.stop()
+    return measurements
+
+def profile_pipeline(steps, input_file, sample_size=10000, n_blocks=10, chunk_size=300000,
+                     max_rows=None, trace_memory=True, confidence=0.95, seed=None, warmup_rows=100):
+    """
+    Dry run the steps on a uniform sample of input_file and project the cost of the full run.
+
+    The sample is split into n_blocks blocks and each block is run through the steps on its own, so
+    the spread between blocks gives the confidence intervals. warmup_rows rows are run through the steps
+    untimed first to pay any one time setup cost. Per row rates are scaled up to the
+    projected number of rows reaching each step. Memory is projected per chunk of chunk_size input rows,
+    since that is what is held in memory at once, and includes the chunk itself.
+
+    Steps with cross_row set (deduplication) only see duplicates within a small block of a uniform
+    sample, not a contiguous chunk, so their retention is an upper bound. They are marked block_local
+    in the report and get no rows out confidence interval
+    """
+    offsets, total_lines = reservoir_sample(iter_line_offsets(input_file), sample_size, seed=seed)
+    records, failed = read_records_at_offsets(input_file, offsets)
+    if not records:
+        raise ValueError(f"No valid JSON records sampled from {input_file}")
+
+    # main.py skips undecodable lines, scale the full row count the same way
+    full_rows = total_lines * len(records) / (len(records) + failed)
+    if max_rows is not None:
+        full_rows = min(full_rows, max_rows)
+
+    # offsets were read back in file order, shuffle so every block is a uniform sample
+    random.Random(seed).shuffle(records)
+    n_blocks = max(1, min(n_blocks, len(records)))
+    blocks = [records[i::n_blocks] for i in range(n_blocks)]
+
+    # untimed warm up so one time setup (e.g. langdetect loading its profiles) doesn't land in the first block
+    run_steps_on_block(steps, blocks[0][:warmup_rows])
+
+    # timing and memory are measured in separate passes as tracemalloc slows python down
+    timing_runs = [run_steps_on_block(steps, block) for block in blocks]
+    memory_runs = None
+    if trace_memory:
+        memory_runs = [run_steps_on_block(steps, block, trace_memory=True) for block in blocks]
+
+    # a dry run should not leave sample rows behind for the real run's reports
+    for step in steps:
+        step.removed_rows = pd.DataFrame()
+
+    rows = []
+    projected_rows_in = full_rows
+    for i, step in enumerate(steps):
+        block_stats = [run[i] for run in timing_runs]
+        retention = [m['rows_out'] / m['rows_in'] if m['rows_in'] else 1.0 for m in block_stats]
+        sec_per_row = [m['runtime_sec'] / m['rows_in'] if m['rows_in'] else 0.0 for m in block_stats]
+        bytes_per_row = [m['output_bytes'] / m['rows_in'] if m['rows_in'] else 0.0 for m in block_stats]
+
+        retention_mean, retention_low, retention_high = confidence_interval(retention, confidence)
+        retention_low, retention_high = max(retention_low, 0.0), min(retention_high, 1.0)
+        if step.cross_row:
+            # the spread between blocks says nothing about duplicates across a real chunk
+            retention_low, retention_high = np.nan, np.nan
+        time_mean, time_low, time_high = confidence_interval(sec_per_row, confidence)
+        size_mean, size_low, size_high = confidence_interval(bytes_per_row, confidence)
+
+        row = {
+            'step_name': step.name,
+            'sample_rows_in': sum(m['rows_in'] for m in block_stats),
+            'sample_rows_out': sum(m['rows_out'] for m in block_stats),
+            'block_local': step.cross_row,
+            'projected_rows_in': projected_rows_in,
+            'projected_rows_out': projected_rows_in * retention_mean,
+            'projected_rows_out_low': projected_rows_in * retention_low,
+            'projected_rows_out_high': projected_rows_in * retention_high,
+            'projected_runtime_sec': projected_rows_in * time_mean,
+            'projected_runtime_sec_low': projected_rows_in * max(time_low, 0.0),
+            'projected_runtime_sec_high': projected_rows_in * time_high,
+            'projected_output_bytes': projected_rows_in * size_mean,
+            'projected_output_bytes_low': projected_rows_in * max(size_low, 0.0),
+            'projected_output_bytes_high': projected_rows_in * size_high,
+        }
+
+        if memory_runs is not None:
+            # the peak includes the whole resident chunk, so scale by the rows the block started with
+            memory_per_row = [run[i]['peak_memory_bytes'] / run[0]['rows_in'] for run in memory_runs]
+            memory_mean, memory_low, memory_high = confidence_interval(memory_per_row, confidence)
+            row['projected_chunk_peak_memory_bytes'] = chunk_size * memory_mean
+            row['projected_chunk_peak_memory_bytes_low'] = chunk_size * max(memory_low, 0.0)
+            row['projected_chunk_peak_memory_bytes_high'] = chunk_size * memory_high
+
+        rows.append(row)
+        projected_rows_in = projected_rows_in * retention_mean
+
+    report = pd.DataFrame(rows)
+    total_runtime = report['projected_runtime_sec'].sum()
+    report['runtime_share'] = report['projected_runtime_sec'] / total_runtime if total_runtime else 0.0
+    return report
+
+def check_memory_traced(report):
+    """
+    Raise if the report has no memory projections (dry run made with trace_memory=False)
+    """
+    if 'projected_chunk_peak_memory_bytes_high' not in report.columns:
+        raise ValueError("Memory recommendations need a dry run report made with trace_memory=True")
+
+def recommend_chunk_size(report, chunk_size, memory_budget_bytes):
+    """
+    Largest chunk size whose projected peak memory (upper bound, worst step) fits in the budget.
+    report must come from profile_pipeline run with the same chunk_size and trace_memory=True.
+    Native allocations are not traced, so leave headroom in the budget for them
+    """
+    check_memory_traced(report)
+    peak = report['projected_chunk_peak_memory_bytes_high'].max()
+    if not peak:
+        return chunk_size
+    return max(1, int(chunk_size * memory_budget_bytes / peak))
+
+def recommend_workers(report, memory_budget_bytes, max_workers):
+    """
+    Number of chunks that can be processed side by side within the memory budget
+    """
+    check_memory_traced(report)
+    peak = report['projected_chunk_peak_memory_bytes_high'].max()
+    if not peak:
+        return max_workers
+    return max(1, min(max_workers, int(memory_budget_bytes // peak)))
@@ -0,0 +1,257 @@
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import gzip
+import glob
+import os
+
+class OutputWriter:
+    """
+    Writes cleaned DataFrame chunks to size limited shards, plus an index CSV mapping each document id
+    to its shard number and offset within that shard.
+
+    Shards are named <output root>-00000<extension>, the index is <output root>_index.csv.
+    Both are rewritten on every run, existing shards with the same output root are removed.
+    Each document is given a global id in id_column (overwriting the chunk local doc_id from deduplication)
+    """
+    extension = None
+
+    def __init__(self, output_file, max_shard_bytes=1024**3, compression=None, id_column="doc_id"):
+        self.output_root = os.path.splitext(output_file)[0]
+        self.max_shard_bytes = max_shard_bytes
+        self.compression = compression
+        self.id_column = id_column
+        self.shard = 0
+        self.docs_written = 0
+        self.shard_paths = []
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+        # shards left by an earlier run (in any format) would not be in the new index
+        for old_shard in glob.glob(f"{glob.escape(self.output_root)}-[0-9][0-9][0-9][0-9][0-9].*"):
+            os.remove(old_shard)
+        self.index_file = open(f"{self.output_root}_index.csv", "w", encoding="utf-8", newline="")
+        pd.DataFrame(columns=[id_column, "shard", "offset"]).to_csv(self.index_file, index=False)
+
+    def shard_path(self, shard):
+        return f"{self.output_root}-{shard:05d}{self.extension}"
+
+    def write(self, df: pd.DataFrame):
+        """
+        Assign global document ids to the chunk and write it out
+        """
+        if len(df) == 0:
+            return
+        ids = np.arange(self.docs_written, self.docs_written + len(df), dtype=np.int64)
+        df = df.drop(columns=[self.id_column], errors="ignore")
+        df.insert(0, self.id_column, ids)
+        self.write_chunk(df, ids)
+        self.docs_written += len(df)
+
+    def write_chunk(self, df: pd.DataFrame, ids):
+        """Override this method in subclasses"""
+        raise NotImplementedError
+
+    def write_index(self, ids, offsets):
+        pd.DataFrame({self.id_column: ids, "shard": self.shard, "offset": offsets}).to_csv(
+            self.index_file, header=False, index=False)
+
+    def close_shard(self):
+        """Override this method in subclasses"""
+        raise NotImplementedError
+
+    def roll_over(self):
+        self.close_shard()
+        self.shard += 1
+
+    def close(self):
+        self.close_shard()
+        self.index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class JsonlWriter(OutputWriter):
+    """
+    Bulk JSONL writer, each chunk is serialised in one call and written as one block.
+    The output is equivalent JSON to json.dumps per record but not byte identical: to_json writes "/" as
+    "\\/" and floats with at most 15 significant digits (e.g. 0.30000000000000004 becomes 0.3).
+    Index offsets are byte offsets of each line in the (uncompressed) shard, and the shard size limit
+    is also on uncompressed bytes. compression can be None or "gzip"
+    """
+    def __init__(self, output_file, max_shard_bytes=1024**3, compression=None, id_column="doc_id"):
+        if compression not in (None, "gzip"):
+            raise ValueError(f"Unsupported JSONL compression: {compression}")
+        self.extension = os.path.splitext(output_file)[1] + (".gz" if compression == "gzip" else "")
+        super().__init__(output_file, max_shard_bytes, compression, id_column)
+        self.file = None
+        self.shard_bytes = 0
+
+    def open_shard(self):
+        path = self.shard_path(self.shard)
+        self.file = gzip.open(path, "wb") if self.compression == "gzip" else open(path, "wb")
+        self.shard_paths.append(path)
+        self.shard_bytes = 0
+
+    def close_shard(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def write_chunk(self, df, ids):
+        data = df.to_json(orient="records", lines=True, force_ascii=False, double_precision=15).encode("utf-8")
+        if not data.endswith(b"\n"):
+            data += b"\n"
+
+        # newlines inside text are escaped by to_json, so every newline byte ends a record
+        line_ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord("\n")) + 1
+        line_starts = np.concatenate(([0], line_ends[:-1]))
+
+        row = 0
+        while row < len(df):
+            if self.file is None:
+                self.open_shard()
+            base = line_starts[row]
+            # rows [row, stop) fit in the space left in this shard
+            stop = int(np.searchsorted(line_ends, base + self.max_shard_bytes - self.shard_bytes, side="right"))
+            if stop == row:
+                if self.shard_bytes > 0:
+                    self.roll_over()
+                    continue
+                stop = row + 1 # a single record bigger than the limit gets a shard to itself
+
+            end = line_ends[stop - 1]
+            self.file.write(data[base:end])
+            self.write_index(ids[row:stop], line_starts[row:stop] - base + self.shard_bytes)
+            self.shard_bytes += int(end - base)
+            row = stop
+
+            if self.shard_bytes >= self.max_shard_bytes:
+                self.roll_over()
+
+class ArrowShardWriter(OutputWriter):
+    """
+    Base for the columnar writers. Chunks are converted to an Arrow table without going through
+    python objects and written in row groups / record batches of at most row_group_size rows, shrunk to
+    the space left in the shard (estimated from the bytes per row written so far). When less than
+    min_row_group_size rows would fit, the shard rolls over instead of writing a small group.
+    max_shard_bytes is a soft limit: rows vary in size and the footer is not estimated, so a shard can
+    overshoot by part of a row group and the first group of a shard is never smaller than min_row_group_size.
+    Index offsets are row numbers in the shard
+    """
+    def __init__(self, output_file, max_shard_bytes=1024**3, compression="zstd", id_column="doc_id",
+                 row_group_size=50000, min_row_group_size=1000):
+        super().__init__(output_file, max_shard_bytes, compression, id_column)
+        self.row_group_size = row_group_size
+        self.min_row_group_size = min_row_group_size
+        self.sink = None
+        self.writer = None
+        self.schema = None
+        self.shard_rows = 0
+
+    def open_shard(self, schema):
+        path = self.shard_path(self.shard)
+        self.sink = pa.OSFile(path, "wb")
+        self.schema = schema
+        self.writer = self.open_writer(self.sink, schema)
+        self.shard_paths.append(path)
+        self.shard_rows = 0
+
+    def open_writer(self, sink, schema):
+        """Override this method in subclasses"""
+        raise NotImplementedError
+
+    def write_table(self, table):
+        """Override this method in subclasses"""
+        raise NotImplementedError
+
+    def close_shard(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.sink.close()
+            self.writer = None
+            self.sink = None
+            self.shard_rows = 0
+
+    def write_chunk(self, df, ids):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+        start = 0
+        while start < table.num_rows:
+            # cap the row group at the space left in the shard. Once the shard holds rows, bytes per row
+            # comes from what has been written so it is in the same (compressed) units as the space left
+            if self.shard_rows > 0:
+                written = self.sink.tell()
+                bytes_per_row = max(1, written // self.shard_rows)
+            else:
+                written = 0
+                bytes_per_row = max(1, table.nbytes // table.num_rows)
+            rows = min(self.row_group_size, (self.max_shard_bytes - written) // bytes_per_row)
+            min_rows = min(self.min_row_group_size, table.num_rows - start)
+            if rows < min_rows:
+                if self.shard_rows > 0:
+                    # too little space left for a useful row group
+                    self.roll_over()
+                    continue
+                rows = min_rows
+            batch = table.slice(start, rows)
+            if self.writer is not None and not batch.schema.equals(self.schema):
+                # e.g. a column that is all null in one chunk, start a new shard if it can't be cast
+                try:
+                    batch = batch.cast(self.schema)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError, ValueError, TypeError):
+                    self.roll_over()
+                    continue
+            if self.writer is None:
+                self.open_shard(batch.schema)
+
+            self.write_table(batch)
+            self.write_index(ids[start:start + batch.num_rows],
+                             np.arange(self.shard_rows, self.shard_rows + batch.num_rows))
+            self.shard_rows += batch.num_rows
+            start += batch.num_rows
+
+            if self.sink.tell() >= self.max_shard_bytes:
+                self.roll_over()
+
+class ParquetWriter(ArrowShardWriter):
+    """
+    Sharded Parquet writer. compression is any Parquet codec, e.g. "zstd", "snappy" or None
+    """
+    extension = ".parquet"
+
+    def open_writer(self, sink, schema):
+        return pq.ParquetWriter(sink, schema, compression=self.compression or "none")
+
+    def write_table(self, table):
+        self.writer.write_table(table, row_group_size=self.row_group_size)
+
+class ArrowWriter(ArrowShardWriter):
+    """
+    Sharded Arrow IPC file writer, shards can be memory mapped with pyarrow.memory_map.
+    compression is "zstd", "lz4" or None (uncompressed shards are zero copy when memory mapped)
+    """
+    extension = ".arrow"
+
+    def open_writer(self, sink, schema):
+        return pa.ipc.new_file(sink, schema, options=pa.ipc.IpcWriteOptions(compression=self.compression))
+
+    def write_table(self, table):
+        self.writer.write_table(table, max_chunksize=self.row_group_size)
+
+WRITERS = {
+    "jsonl": JsonlWriter,
+    "parquet": ParquetWriter,
+    "arrow": ArrowWriter,
+}
+
+def make_writer(output_format, output_file, **kwargs):
+    """
+    Create the output writer for output_format ("jsonl", "parquet" or "arrow")
+    """
+    if output_format not in WRITERS:
+        raise ValueError(f"Unknown output format: {output_format}, expected one of {list(WRITERS)}")
+    return WRITERS[output_format](output_file, **kwargs)